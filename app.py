@@ -1,9 +1,17 @@
+import gzip
+import html
 import os
 import logging
-from datetime import datetime
-from flask import Flask, request, render_template_string, jsonify
+import string
+import time
+import uuid
+from flask import Flask, Response, request, jsonify, abort
+from flask.json.provider import JSONProvider
+import orjson
 import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
+from botocore.config import Config
+from botocore.exceptions import NoCredentialsError
+from botocore.utils import check_dns_name
 from werkzeug.utils import secure_filename
 
 # Logging configuration
@@ -13,22 +21,97 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class ORJSONProvider(JSONProvider):
+    """
+    JSON provider backed by orjson.
+
+    orjson serializes directly to bytes and is several times faster than the
+    standard library json module used by Flask's default provider. Unlike the
+    default provider, keys are only sorted when sort_keys is set (off by
+    default), and values orjson does not support natively (e.g. Decimal or
+    objects with __html__) need a ``default`` function passed to dumps().
+    """
+
+    sort_keys = False
+
+    def _encode(self, obj, default=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj, kwargs.get('default')).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        if not args and not kwargs:
+            obj = None
+        else:
+            obj = args[0] if len(args) == 1 else args or kwargs
+        return self._app.response_class(self._encode(obj), mimetype='application/json')
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
-# Maximum file size configuration (16 MB)
+# Maximum file size configuration (16 MB), enforced by S3 on direct uploads
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
+# Validity of the presigned POST returned to the browser (in seconds)
+PRESIGNED_POST_EXPIRATION = 300
+
 # Environment variables
 AWS_REGION = os.getenv('AWS_REGION', 'eu-west-1')
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 
-logger.info("=== Application Configuration ===")
-logger.info(f"AWS_REGION: {AWS_REGION}")
-logger.info(f"S3_BUCKET_NAME: {S3_BUCKET_NAME}")
-logger.info(f"AWS_ACCESS_KEY_ID: {'*' * 8 if AWS_ACCESS_KEY_ID else 'Not defined'}")
-logger.info(f"AWS_SECRET_ACCESS_KEY: {'*' * 8 if AWS_SECRET_ACCESS_KEY else 'Not defined'}")
+# Upload through S3 Transfer Acceleration (must be enabled on the bucket)
+S3_ACCELERATE = os.getenv('S3_ACCELERATE') == '1'
+
+# Transfer Acceleration needs the bucket name to be a valid DNS label
+# (lowercase letters, digits and hyphens only, no dots)
+if S3_ACCELERATE and S3_BUCKET_NAME and not check_dns_name(S3_BUCKET_NAME):
+    logger.warning(
+        "S3 Transfer Acceleration requires a DNS-compatible bucket name without dots, "
+        "disabling it for bucket '%s'", S3_BUCKET_NAME
+    )
+    S3_ACCELERATE = False
+
+
+def _log_startup():
+    """Logs the application configuration, called once when the server starts"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    logger.info("=== Application Configuration ===")
+    logger.info("AWS_REGION: %s", AWS_REGION)
+    logger.info("S3_BUCKET_NAME: %s", S3_BUCKET_NAME)
+    logger.info("S3_ACCELERATE: %s", S3_ACCELERATE)
+    logger.info("AWS_ACCESS_KEY_ID: %s", '********' if AWS_ACCESS_KEY_ID else 'Not defined')
+    logger.info("AWS_SECRET_ACCESS_KEY: %s", '********' if AWS_SECRET_ACCESS_KEY else 'Not defined')
+
+
+# S3 client configuration
+# The connection pool must be at least as large as the number of threads
+# calling S3 concurrently, otherwise threads wait for a free connection and
+# botocore discards connections ("Connection pool is full").
+S3_MAX_POOL_CONNECTIONS = 64
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'},
+    signature_version='s3v4',
+    # Presigned POSTs target the regional virtual-hosted endpoint
+    # (https://<bucket>.s3.<region>.amazonaws.com/) rather than the global one
+    s3={'addressing_style': 'virtual'}
+)
 
 
 def get_s3_client():
@@ -36,64 +119,121 @@ def get_s3_client():
     Creates and returns an S3 client using AWS credentials.
 
     Uses AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY from environment variables.
+    Called once at import time: botocore clients are thread-safe, so the same
+    client (and its connection pool) is shared by every request.
+
+    Raises:
+        NoCredentialsError: No AWS credentials are available, the client could
+            not sign presigned POSTs
+    """
+    logger.info("Creating S3 client with AWS credentials")
+
+    # Credentials are resolved once, when the client is created
+    session = boto3.session.Session()
+    if session.get_credentials() is None:
+        raise NoCredentialsError()
+
+    # Create S3 client (boto3 will automatically use AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY from env vars)
+    s3_client = session.client('s3', region_name=AWS_REGION, config=S3_CLIENT_CONFIG)
+
+    logger.info("S3 client created successfully")
+    return s3_client
+
+
+# The detection runs at import, so it must fail fast when S3 is unreachable
+BUCKET_REGION_DETECTION_CONFIG = Config(
+    connect_timeout=2,
+    read_timeout=2,
+    retries={'total_max_attempts': 1, 'mode': 'standard'}
+)
+
+
+def detect_bucket_region():
+    """
+    Returns the region of the S3 bucket, or None if it cannot be determined.
+
+    Requires the s3:GetBucketLocation permission. A client in the wrong region
+    pays a redirect round-trip on every request, so this is used at startup
+    when AWS_REGION is not set explicitly.
     """
     try:
-        logger.info("Creating S3 client with AWS credentials")
+        s3_client = boto3.client('s3', region_name=AWS_REGION, config=BUCKET_REGION_DETECTION_CONFIG)
+        location = s3_client.get_bucket_location(Bucket=S3_BUCKET_NAME)['LocationConstraint']
+    except Exception as e:
+        logger.warning("Could not detect the region of bucket '%s': %s", S3_BUCKET_NAME, e)
+        return None
 
-        # Create S3 client (boto3 will automatically use AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY from env vars)
-        s3_client = boto3.client('s3', region_name=AWS_REGION)
+    # Buckets in us-east-1 have no location constraint, legacy eu-west-1 buckets report 'EU'
+    return {None: 'us-east-1', 'EU': 'eu-west-1'}.get(location, location)
 
-        # Connection test
-        s3_client.list_buckets()
-        logger.info("S3 client created successfully")
-        return s3_client
 
-    except NoCredentialsError:
-        logger.error("No AWS credentials found. Please set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
-        raise
-    except ClientError as e:
-        logger.error(f"Error creating S3 client: {e}")
-        raise
+# AWS_REGION is authoritative when set, otherwise use the bucket's actual region
+if 'AWS_REGION' not in os.environ and S3_BUCKET_NAME:
+    AWS_REGION = detect_bucket_region() or AWS_REGION
 
+# Shared S3 client, built once so requests skip client construction
+try:
+    S3_CLIENT = get_s3_client()
+except NoCredentialsError:
+    logger.error("No AWS credentials found. Please set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
+    S3_CLIENT = None
+except Exception as e:
+    logger.error("Error creating S3 client: %s", e, exc_info=True)
+    S3_CLIENT = None
 
-def upload_file_to_s3(file, filename):
+
+def create_presigned_upload(filename, content_type):
     """
-    Uploads a file to S3.
+    Generates a presigned POST allowing the browser to upload a file directly to S3.
+
+    The file never goes through the application: S3 checks the policy (key,
+    content type and maximum size) signed here.
 
     Args:
-        file: Flask file object
         filename: Secured filename
+        content_type: MIME type of the file
 
     Returns:
-        dict: Information about the uploaded file
+        dict: Presigned POST (url and form fields) and information about the file
     """
     if not S3_BUCKET_NAME:
         raise ValueError("S3_BUCKET_NAME is not defined")
+    if S3_CLIENT is None:
+        raise ValueError("S3 client could not be created, check the AWS configuration")
 
     try:
-        s3_client = get_s3_client()
-
-        # Generate unique key with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        s3_key = f"uploads/{timestamp}-{filename}"
-
-        logger.info(f"Uploading file '{filename}' to s3://{S3_BUCKET_NAME}/{s3_key}")
-
-        # Upload to S3
-        s3_client.upload_fileobj(
-            file,
-            S3_BUCKET_NAME,
-            s3_key,
-            ExtraArgs={'ContentType': file.content_type or 'application/octet-stream'}
+        # Generate unique key under a UTC date prefix; the UUID guarantees that
+        # concurrent uploads of the same file never overwrite each other
+        t = time.gmtime()
+        date = f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}"
+        s3_key = f"uploads/{date}/{uuid.uuid4().hex}-{filename}"
+
+        logger.info("Presigning upload of file '%s' to s3://%s/%s", filename, S3_BUCKET_NAME, s3_key)
+
+        presigned_post = S3_CLIENT.generate_presigned_post(
+            Bucket=S3_BUCKET_NAME,
+            Key=s3_key,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                ['content-length-range', 0, app.config['MAX_CONTENT_LENGTH']],
+                {'Content-Type': content_type}
+            ],
+            ExpiresIn=PRESIGNED_POST_EXPIRATION
         )
 
+        # botocore refuses to presign POSTs through the accelerate endpoint for
+        # some bucket names; the signed policy does not cover the host, so the
+        # POST is signed for the regional endpoint and sent to the accelerate one
+        post_url = presigned_post['url']
+        if S3_ACCELERATE:
+            post_url = f"https://{S3_BUCKET_NAME}.s3-accelerate.amazonaws.com/"
+
         # Build S3 URL
         s3_url = f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
 
-        logger.info(f"✅ File uploaded successfully: {s3_url}")
-
         return {
-            'success': True,
+            'url': post_url,
+            'fields': presigned_post['fields'],
             'filename': filename,
             's3_key': s3_key,
             's3_url': s3_url,
@@ -102,7 +242,7 @@ def upload_file_to_s3(file, filename):
         }
 
     except Exception as e:
-        logger.error(f"❌ Upload error: {str(e)}")
+        logger.error("❌ Presigning error: %s", e, exc_info=True)
         raise
 
 
@@ -269,13 +409,9 @@ HTML_TEMPLATE = """
             <div>🔐 Auth: <strong>{{ auth_method }}</strong></div>
         </div>
 
-        {% if message %}
-        <div class="alert alert-{{ message_type }}">
-            {{ message|safe }}
-        </div>
-        {% endif %}
+        <!--MSG-->
 
-        <form method="POST" action="/upload" enctype="multipart/form-data" id="uploadForm">
+        <form id="uploadForm">
             <div class="upload-area" id="uploadArea">
                 <label for="file" class="file-label">
                     📁 Click to select a file<br>
@@ -342,122 +478,225 @@ HTML_TEMPLATE = """
             fileInput.click();
         });
 
+        // Display the upload result above the form
+        function showAlert(messageHtml, type) {
+            document.querySelectorAll('.alert').forEach(alert => alert.remove());
+            const alert = document.createElement('div');
+            alert.className = `alert alert-${type}`;
+            alert.innerHTML = messageHtml;
+            uploadForm.before(alert);
+        }
+
+        // Maximum file size, also enforced by S3 through the presigned POST policy
+        const MAX_FILE_SIZE = {{ max_file_size }};
+        const FILE_TOO_LARGE_MESSAGE = `❌ File too large (${MAX_FILE_SIZE / 1024 / 1024} MB maximum)`;
+
+        // Explain an S3 error from the <Code> element of its XML response
+        async function s3ErrorMessage(s3Response) {
+            let code = null;
+            try {
+                const xml = new DOMParser().parseFromString(await s3Response.text(), 'application/xml');
+                code = xml.querySelector('Error > Code')?.textContent;
+            } catch (err) {
+                // Unreadable response, fall back to the HTTP status
+            }
+            if (code === 'EntityTooLarge') {
+                return FILE_TOO_LARGE_MESSAGE;
+            }
+            const reason = code ? code.replace(/[^A-Za-z0-9]/g, '') : `HTTP ${s3Response.status}`;
+            return `❌ Upload error: ${reason}`;
+        }
+
+        // Get a presigned POST from the application, then send the file directly to S3
+        async function uploadFile(file) {
+            if (file.size > MAX_FILE_SIZE) {
+                return {status: 'error', message: FILE_TOO_LARGE_MESSAGE};
+            }
+
+            const params = new URLSearchParams({
+                filename: file.name,
+                content_type: file.type || 'application/octet-stream'
+            });
+            const response = await fetch(`/upload-url?${params}`);
+            const upload = await response.json();
+            if (!response.ok) {
+                return upload;
+            }
+
+            const formData = new FormData();
+            Object.entries(upload.fields).forEach(([name, value]) => formData.append(name, value));
+            formData.append('file', file);
+
+            const s3Response = await fetch(upload.url, {method: 'POST', body: formData});
+            if (!s3Response.ok) {
+                return {status: 'error', message: await s3ErrorMessage(s3Response)};
+            }
+            return {status: 'success', message: upload.message};
+        }
+
         // Animation during upload
-        uploadForm.addEventListener('submit', function() {
+        uploadForm.addEventListener('submit', async function(e) {
+            e.preventDefault();
             submitBtn.disabled = true;
             submitBtn.classList.add('loading');
             btnText.style.display = 'none';
+
+            try {
+                const result = await uploadFile(fileInput.files[0]);
+                showAlert(result.message, result.status === 'success' ? 'success' : 'error');
+            } catch (err) {
+                showAlert('❌ Upload error: the upload could not be sent', 'error');
+            } finally {
+                submitBtn.disabled = false;
+                submitBtn.classList.remove('loading');
+                btnText.style.display = '';
+            }
         });
     </script>
 </body>
 </html>
 """
 
+# Compile the template once instead of re-parsing it on every request
+TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
+# Region, bucket and auth method are fixed at startup, so the page is rendered
+# once and split around the alert placeholder; requests only splice the alert in
+MESSAGE_PLACEHOLDER = '<!--MSG-->'
+MESSAGE_TYPES = ('success', 'error')
+
+# Success message with S3 link, values are HTML-escaped before substitution
+SUCCESS_MESSAGE_TEMPLATE = string.Template("""
+        ✅ <strong>File uploaded successfully!</strong><br><br>
+        📁 File: <strong>$filename</strong><br>
+        🔑 S3 Key: <code>$s3_key</code><br>
+        🔗 URL: <a href="$s3_url" class="s3-link" target="_blank">$s3_url</a>
+    """)
+
+PAGE_PREFIX, PAGE_SUFFIX = TEMPLATE.render(
+    region=AWS_REGION,
+    bucket=S3_BUCKET_NAME or "Not configured",
+    auth_method="AWS Access Key",
+    max_file_size=app.config['MAX_CONTENT_LENGTH']
+).split(MESSAGE_PLACEHOLDER)
+PAGE_HTML = (PAGE_PREFIX + PAGE_SUFFIX).encode()
+
+# The page without alert is compressed once at maximum level; pages with an
+# alert are compressed on the fly
+PAGE_HTML_GZIP = gzip.compress(PAGE_HTML, 9)
+
+
+def render_page(message_html=None, message_type='success'):
+    """
+    Builds the home page response with an optional alert.
+
+    The body is gzip-compressed when the client accepts it.
+
+    Args:
+        message_html: Alert content as HTML (callers escape untrusted values)
+        message_type: Alert style, 'success' or 'error'
+
+    Returns:
+        Response: HTML response
+    """
+    accepts_gzip = request.accept_encodings['gzip'] > 0
+
+    if not message_html:
+        body = PAGE_HTML_GZIP if accepts_gzip else PAGE_HTML
+    else:
+        body = ''.join([
+            PAGE_PREFIX,
+            f'<div class="alert alert-{message_type}">{message_html}</div>',
+            PAGE_SUFFIX
+        ]).encode()
+        if accepts_gzip:
+            body = gzip.compress(body, 6)
+
+    response = Response(body, mimetype='text/html')
+    response.vary.add('Accept-Encoding')
+    if accepts_gzip:
+        response.content_encoding = 'gzip'
+    return response
+
+
+@app.before_request
+def reject_oversized_requests():
+    """Rejects requests whose declared body size exceeds MAX_CONTENT_LENGTH before reading it"""
+    content_length = request.content_length
+    if content_length and content_length > app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+
 
 @app.route('/')
 def index():
     """Home page with upload form"""
-    auth_method = "AWS Access Key"
-
-    return render_template_string(
-        HTML_TEMPLATE,
-        region=AWS_REGION,
-        bucket=S3_BUCKET_NAME or "Not configured",
-        auth_method=auth_method,
-        message=request.args.get('message'),
-        message_type=request.args.get('type', 'success')
-    )
+    message = request.args.get('message')
+    message_type = request.args.get('type', 'success')
+    if message_type not in MESSAGE_TYPES:
+        message_type = 'success'
+
+    return render_page(html.escape(message) if message else None, message_type)
+
 
+@app.route('/upload-url')
+def upload_url():
+    """Endpoint returning a presigned POST to upload a file directly to S3"""
+    # Secure the filename
+    filename = secure_filename(request.args.get('filename', ''))
+
+    # Check if file has a name
+    if not filename:
+        logger.warning("Empty filename")
+        return jsonify({'status': 'error', 'message': "❌ No file selected"}), 400
+
+    content_type = request.args.get('content_type') or 'application/octet-stream'
+    logger.info("📤 Upload requested for file: %s", filename)
 
-@app.route('/upload', methods=['POST'])
-def upload():
-    """Endpoint to upload a file to S3"""
     try:
-        # Check if file is present
-        if 'file' not in request.files:
-            logger.warning("No file in request")
-            return render_template_string(
-                HTML_TEMPLATE,
-                region=AWS_REGION,
-                bucket=S3_BUCKET_NAME,
-                auth_method="AWS Access Key",
-                message="❌ No file selected",
-                message_type='error'
-            )
-
-        file = request.files['file']
-
-        # Check if file has a name
-        if file.filename == '':
-            logger.warning("Empty filename")
-            return render_template_string(
-                HTML_TEMPLATE,
-                region=AWS_REGION,
-                bucket=S3_BUCKET_NAME,
-                auth_method="AWS Access Key",
-                message="❌ No file selected",
-                message_type='error'
-            )
-
-        # Secure the filename
-        filename = secure_filename(file.filename)
-        logger.info(f"📤 Receiving file: {filename}")
-
-        # Upload to S3
-        result = upload_file_to_s3(file, filename)
-
-        # Success message with S3 link
-        success_message = f"""
-            ✅ <strong>File uploaded successfully!</strong><br><br>
-            📁 File: <strong>{result['filename']}</strong><br>
-            🔑 S3 Key: <code>{result['s3_key']}</code><br>
-            🔗 URL: <a href="{result['s3_url']}" class="s3-link" target="_blank">{result['s3_url']}</a>
-        """
-
-        return render_template_string(
-            HTML_TEMPLATE,
-            region=AWS_REGION,
-            bucket=S3_BUCKET_NAME,
-            auth_method="AWS Access Key",
-            message=success_message,
-            message_type='success'
-        )
+        result = create_presigned_upload(filename, content_type)
 
     except ValueError as e:
-        logger.error(f"Configuration error: {str(e)}")
-        return render_template_string(
-            HTML_TEMPLATE,
-            region=AWS_REGION,
-            bucket=S3_BUCKET_NAME or "Not configured",
-            auth_method="AWS Access Key",
-            message=f"❌ Configuration error: {str(e)}",
-            message_type='error'
-        )
+        logger.error("Configuration error: %s", e)
+        return jsonify({
+            'status': 'error',
+            'message': f"❌ Configuration error: {html.escape(str(e))}"
+        }), 500
 
     except Exception as e:
-        logger.error(f"Upload error: {str(e)}")
-        return render_template_string(
-            HTML_TEMPLATE,
-            region=AWS_REGION,
-            bucket=S3_BUCKET_NAME,
-            auth_method="AWS Access Key",
-            message=f"❌ Upload error: {str(e)}",
-            message_type='error'
-        )
+        logger.error("Upload error: %s", e)
+        return jsonify({
+            'status': 'error',
+            'message': f"❌ Upload error: {html.escape(str(e))}"
+        }), 500
+
+    # Success message with S3 link, displayed once the browser upload succeeds
+    success_message = SUCCESS_MESSAGE_TEMPLATE.substitute(
+        filename=html.escape(result['filename']),
+        s3_key=html.escape(result['s3_key']),
+        s3_url=html.escape(result['s3_url'])
+    )
+
+    return jsonify({'status': 'ready', 'message': success_message, **result})
+
 
+# The health payload only depends on the startup configuration
+HEALTH_BODY = orjson.dumps({
+    'status': 'healthy',
+    'region': AWS_REGION,
+    'bucket': S3_BUCKET_NAME,
+    'auth_method': 'access_key'
+})
 
-@app.route('/health')
+
+@app.route('/health', methods=['GET', 'HEAD'])
 def health():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'region': AWS_REGION,
-        'bucket': S3_BUCKET_NAME,
-        'auth_method': 'access_key'
-    }), 200
+    return Response(HEALTH_BODY, status=200, mimetype='application/json')
 
 
 if __name__ == '__main__':
+    _log_startup()
+
     # Configuration check
     if not S3_BUCKET_NAME:
         logger.warning("⚠️  S3_BUCKET_NAME is not defined!")
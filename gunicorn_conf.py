@@ -0,0 +1,29 @@
+"""Gunicorn configuration for production"""
+
+bind = '0.0.0.0:8080'
+
+# Threaded workers: each idle keep-alive connection holds a thread, so 2x32
+# threads leave room for open browser connections alongside concurrent page and
+# presigned POST requests (which only sign locally and never wait on S3)
+worker_class = 'gthread'
+workers = 2
+threads = 32
+keepalive = 30
+
+# Timeout of 120s for slow clients
+timeout = 120
+
+# Load the application once in the master process: the prerendered page and
+# the S3 client are then shared with the workers (copy-on-write)
+preload_app = True
+
+# Logging
+loglevel = 'info'
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Logs the application configuration once the server is started"""
+    from app import _log_startup
+    _log_startup()
@@ -0,0 +1,103 @@
+import decimal
+
+import pytest
+
+
+def test_health(client):
+    response = client.get('/health')
+
+    assert response.status_code == 200
+    assert response.json == {
+        'status': 'healthy',
+        'region': 'eu-west-1',
+        'bucket': 'my-bucket',
+        'auth_method': 'access_key'
+    }
+
+
+def test_json_provider(load_app):
+    app = load_app().app
+
+    with app.app_context():
+        assert app.json.response({'b': 1, 'a': 2}).get_json() == {'b': 1, 'a': 2}
+        assert app.json.response(1, 2).get_json() == [1, 2]
+        assert app.json.response(a=1).get_json() == {'a': 1}
+        assert app.json.response().data == b'null'
+        assert app.json.dumps({1: 'a'}) == '{"1":"a"}'
+        assert app.json.dumps(decimal.Decimal('1.5'), default=str) == '"1.5"'
+
+        app.json.sort_keys = True
+        assert app.json.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+
+        with pytest.raises(TypeError):
+            app.json.response(1, a=1)
+
+
+def test_upload_url(client):
+    response = client.get('/upload-url?filename=my report.pdf&content_type=application/pdf')
+
+    assert response.status_code == 200
+    upload = response.json
+    assert upload['status'] == 'ready'
+    assert upload['url'] == 'https://my-bucket.s3.eu-west-1.amazonaws.com/'
+    assert upload['filename'] == 'my_report.pdf'
+    assert upload['s3_key'].startswith('uploads/')
+    assert upload['s3_key'].endswith('-my_report.pdf')
+    assert upload['fields']['key'] == upload['s3_key']
+    assert upload['fields']['Content-Type'] == 'application/pdf'
+    assert upload['fields']['x-amz-algorithm'] == 'AWS4-HMAC-SHA256'
+    assert 'policy' in upload['fields']
+    assert upload['s3_key'] in upload['message']
+
+
+def test_upload_url_with_accelerate(load_app):
+    client = load_app(S3_ACCELERATE='1').app.test_client()
+
+    response = client.get('/upload-url?filename=report.pdf')
+
+    assert response.status_code == 200
+    assert response.json['url'] == 'https://my-bucket.s3-accelerate.amazonaws.com/'
+    assert response.json['fields']['Content-Type'] == 'application/octet-stream'
+
+
+@pytest.mark.parametrize('bucket', ['my.bucket', 'b', 'My_Legacy_Bucket'])
+def test_upload_url_with_accelerate_and_non_dns_bucket_name(load_app, bucket):
+    app = load_app(S3_ACCELERATE='1', S3_BUCKET_NAME=bucket)
+
+    response = app.app.test_client().get('/upload-url?filename=report.pdf')
+
+    # Acceleration is disabled, the regional endpoint is used with path-style addressing
+    assert response.status_code == 200
+    assert response.json['bucket'] == bucket
+    assert response.json['url'] == f'https://s3.eu-west-1.amazonaws.com/{bucket}'
+
+
+def test_upload_url_without_filename(client):
+    response = client.get('/upload-url?filename=..')
+
+    assert response.status_code == 400
+    assert response.json['status'] == 'error'
+
+
+def test_upload_url_without_credentials(load_app):
+    client = load_app(AWS_ACCESS_KEY_ID=None, AWS_SECRET_ACCESS_KEY=None).app.test_client()
+
+    response = client.get('/upload-url?filename=report.pdf')
+
+    assert response.status_code == 500
+    assert 'Configuration error' in response.json['message']
+
+
+def test_index(client):
+    response = client.get('/')
+
+    assert response.status_code == 200
+    assert 'Bucket: <strong>my-bucket</strong>' in response.text
+    assert 'const MAX_FILE_SIZE = 16777216;' in response.text
+    assert 'class="alert' not in response.text
+
+
+def test_index_escapes_message(client):
+    response = client.get('/?message=<script>alert(1)</script>&type=error')
+
+    assert '<div class="alert alert-error">&lt;script&gt;' in response.text